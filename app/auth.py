@@ -1,11 +1,21 @@
 # Import necessary libraries
-from datetime import datetime, timedelta  # For handling date and time operations
-from jose import JWTError, jwt  # For creating and decoding JWT tokens
-from passlib.context import CryptContext  # For hashing and verifying passwords
+import asyncio  # For offloading blocking work from the event loop
+import os  # For sizing the password hashing thread pool
+import threading  # For guarding the validated token cache
+import time  # For expiring validated token cache entries
+from concurrent.futures import ThreadPoolExecutor  # Dedicated pool for bcrypt work
+from datetime import timedelta  # For handling token lifetimes
+import jwt  # For creating and decoding JWT tokens (PyJWT)
+from jwt import InvalidTokenError as JWTError  # Base error raised for invalid JWT tokens
+try:
+    import bcrypt  # For hashing and verifying passwords
+except ImportError:
+    # No native bcrypt wheel for this platform, use the Numba JIT-compiled implementation
+    from app import bcrypt_fallback as bcrypt
 from fastapi import Depends, HTTPException, status  # For handling HTTP exceptions and request dependencies
 from sqlalchemy.orm import Session  # For SQLAlchemy ORM session management
 from fastapi.security import OAuth2PasswordBearer  # For handling OAuth2 Bearer tokens
-from app import models, crud  # Import application-specific models and CRUD operations
+from app import models, schemas, crud  # Import application-specific models, schemas and CRUD operations
 from app.database import SessionLocal  # Import the database session factory
 
 # Secret key used for encoding and decoding JWT tokens
@@ -14,9 +24,36 @@ SECRET_KEY = "a_secure_secret_key"
 ALGORITHM = "HS256"
 # Token expiration time (in minutes)
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Token expiration time (in seconds), precomputed for the integer `exp` claim
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
-# Create a password hashing context using bcrypt algorithm
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Number of bcrypt rounds (log2 of the work factor) used for new hashes
+# Each extra round doubles the hashing cost; lower it (e.g. 10) only for dev/CI,
+# production deployments must keep at least 12
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt only uses the first 72 bytes of a password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+# Dedicated thread pool for bcrypt hashing and verification
+# Keeping the CPU-bound bcrypt work here prevents it from starving the default
+# threadpool that Starlette uses to run sync endpoints and dependencies
+# The pool lives for the whole process, so the app can be started more than once
+hash_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
+
+# Cache of successfully validated tokens, mapping the raw token to (expiry timestamp, user)
+# A hit skips both the JWT decode and the user lookup; entries are evicted in FIFO order
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_MAX_SIZE = 1024
+_TOKEN_CACHE: dict[str, tuple[float, schemas.User]] = {}
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+# Per-client token buckets limiting login attempts, mapping the client host to (tokens, last refill timestamp)
+# Rejecting bursts before bcrypt runs caps the CPU an attacker can burn on /token
+LOGIN_RATE_PER_SECOND = 5
+LOGIN_BURST = 5
+LOGIN_BUCKETS_MAX_SIZE = 10000
+_LOGIN_BUCKETS: dict[str, tuple[float, float]] = {}
+_LOGIN_BUCKETS_LOCK = threading.Lock()
 
 # Initialize OAuth2PasswordBearer instance with the URL for obtaining tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -46,7 +83,8 @@ def get_password_hash(password: str) -> str:
     Returns:
         str: The hashed password.
     """
-    return pwd_context.hash(password)
+    password_bytes = password.encode()[:BCRYPT_MAX_PASSWORD_BYTES]
+    return bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 # Utility function to verify if a plain password matches the hashed password
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -60,7 +98,37 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True if the password matches, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    password_bytes = plain_password.encode()[:BCRYPT_MAX_PASSWORD_BYTES]
+    return bcrypt.checkpw(password_bytes, hashed_password.encode())
+
+# Async wrapper that hashes a password without blocking the event loop
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hashes a plain password using bcrypt in the dedicated hashing thread pool.
+    
+    Args:
+        password (str): The plain text password to hash.
+        
+    Returns:
+        str: The hashed password.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, get_password_hash, password)
+
+# Async wrapper that verifies a password without blocking the event loop
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifies a plain password against a hashed password in the dedicated hashing thread pool.
+    
+    Args:
+        plain_password (str): The plain text password.
+        hashed_password (str): The hashed password.
+        
+    Returns:
+        bool: True if the password matches, False otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, verify_password, plain_password, hashed_password)
 
 # Utility function to create a JWT access token
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -69,25 +137,60 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     
     Args:
         data (dict): The data to include in the token payload.
-        expires_delta (timedelta | None): The expiration time of the token.
+        expires_delta (timedelta | None): The lifetime of the token. Defaults to ACCESS_TOKEN_EXPIRE_MINUTES.
         
     Returns:
         str: The encoded JWT token.
     """
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expires_in = int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expires_in = ACCESS_TOKEN_EXPIRE_SECONDS
+    # Use an integer POSIX timestamp so the JWT library needs no datetime conversion
+    to_encode["exp"] = int(time.time()) + expires_in
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Hash verified when the user does not exist, so unknown usernames cost as much as real ones
+_DUMMY_HASH = get_password_hash("x")
+
+# Utility function to rate limit login attempts per client
+def allow_login_attempt(client_host: str) -> bool:
+    """
+    Consumes a token from the client's login bucket.
+    
+    Buckets refill at LOGIN_RATE_PER_SECOND up to LOGIN_BURST tokens. The
+    least recently seen clients are evicted once LOGIN_BUCKETS_MAX_SIZE is reached.
+    
+    Args:
+        client_host (str): The address of the client attempting to log in.
+        
+    Returns:
+        bool: True if the attempt is allowed, False if the client is over the limit.
+    """
+    now = time.monotonic()
+    with _LOGIN_BUCKETS_LOCK:
+        tokens, last_refill = _LOGIN_BUCKETS.pop(client_host, (LOGIN_BURST, now))
+        tokens = min(LOGIN_BURST, tokens + (now - last_refill) * LOGIN_RATE_PER_SECOND)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        if len(_LOGIN_BUCKETS) >= LOGIN_BUCKETS_MAX_SIZE:
+            del _LOGIN_BUCKETS[next(iter(_LOGIN_BUCKETS))]
+        _LOGIN_BUCKETS[client_host] = (tokens, now)
+    return allowed
+
 # Utility function to authenticate a user based on username and password
-def authenticate_user(db: Session, username: str, password: str):
+async def authenticate_user(db: Session, username: str, password: str):
     """
     Authenticates a user by checking their username and password.
     
+    The database lookup runs in a worker thread and the bcrypt verification
+    runs in the dedicated hashing pool, so the event loop is never blocked.
+    Unknown usernames are still checked against a dummy hash, so they take
+    as long as real ones and cannot be used as a timing oracle.
+    
     Args:
         db (Session): The database session.
         username (str): The username of the user.
@@ -96,24 +199,77 @@ def authenticate_user(db: Session, username: str, password: str):
     Returns:
         User | False: The user object if authentication is successful, False otherwise.
     """
-    user = db.query(models.User).filter(models.User.name == username).first()
+    user = await asyncio.to_thread(crud.get_user_by_name, db, username)
     if not user:
+        await verify_password_async(password, _DUMMY_HASH)
         return False
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.password):
         return False
     return user
 
+# Utility function to look up a previously validated token
+def _get_cached_user(token: str) -> schemas.User | None:
+    """
+    Returns the user cached for a validated token, or None if it is missing or expired.
+    
+    Args:
+        token (str): The raw JWT token.
+        
+    Returns:
+        schemas.User | None: The cached user if the entry is still valid, otherwise None.
+    """
+    now = time.time()
+    with _TOKEN_CACHE_LOCK:
+        entry = _TOKEN_CACHE.get(token)
+        if entry is None:
+            return None
+        expiry, user = entry
+        if expiry <= now:
+            del _TOKEN_CACHE[token]
+            return None
+        return user
+
+# Utility function to remember a validated token
+def _cache_user(token: str, user: schemas.User, token_expiry: float) -> None:
+    """
+    Caches the user for a validated token until the token expires or the cache TTL elapses.
+    
+    Args:
+        token (str): The raw JWT token.
+        user (schemas.User): The detached user the token belongs to.
+        token_expiry (float): The `exp` claim of the token as a POSIX timestamp.
+    """
+    expiry = min(token_expiry, time.time() + TOKEN_CACHE_TTL_SECONDS)
+    with _TOKEN_CACHE_LOCK:
+        if token not in _TOKEN_CACHE and len(_TOKEN_CACHE) >= TOKEN_CACHE_MAX_SIZE:
+            del _TOKEN_CACHE[next(iter(_TOKEN_CACHE))]
+        _TOKEN_CACHE[token] = (expiry, user)
+
+# Utility function to drop a token from the validated token cache
+def _invalidate_token(token: str) -> None:
+    """
+    Removes a token from the validated token cache.
+    
+    Args:
+        token (str): The raw JWT token.
+    """
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE.pop(token, None)
+
 # Utility function to get the current authenticated user from the token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> schemas.User:
     """
     Retrieves the current user based on the JWT token.
     
+    Successfully validated tokens are cached for a short time, so repeated
+    requests with the same token skip the JWT decode and the database lookup.
+    
     Args:
         token (str): The JWT token from the request.
         db (Session): The database session.
         
     Returns:
-        User: The authenticated user object.
+        schemas.User: The authenticated user, detached from the database session.
         
     Raises:
         HTTPException: If the token is invalid or the user cannot be found.
@@ -123,14 +279,21 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cached_user = _get_cached_user(token)
+    if cached_user is not None:
+        return cached_user
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+        # The token subject is the user's primary key
+        user_id = int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        _invalidate_token(token)
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.name == username).first()
+    user = db.get(models.User, user_id)
     if user is None:
+        _invalidate_token(token)
         raise credentials_exception
-    return user
+    # Store a detached copy so cached entries never touch another request's session
+    current_user = schemas.User.model_validate(user)
+    _cache_user(token, current_user, payload.get("exp", 0))
+    return current_user
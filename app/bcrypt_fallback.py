@@ -0,0 +1,240 @@
+# Pure Python implementation of bcrypt, JIT-compiled with Numba
+# Used by app.auth on platforms where the native bcrypt wheel is not available.
+# It mirrors the subset of the bcrypt package API used by the application
+# (gensalt, hashpw and checkpw) and produces identical $2b$ hashes.
+import base64  # For the bcrypt flavoured base64 encoding
+import hmac  # For constant-time hash comparison
+import os  # For generating random salts
+import numpy as np  # For the Blowfish state arrays
+from numba import njit  # For compiling the Blowfish core to machine code
+
+# Mask used to keep arithmetic within 32 bits
+# Blowfish words are stored as int64 so additions can be masked without
+# mixing signed and unsigned integer types inside the compiled code
+_MASK32 = 0xFFFFFFFF
+
+# Alphabet of the bcrypt base64 encoding, in place of the standard one
+_BCRYPT_ALPHABET = b"./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+_STD_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_TO_BCRYPT = bytes.maketrans(_STD_ALPHABET, _BCRYPT_ALPHABET)
+_FROM_BCRYPT = bytes.maketrans(_BCRYPT_ALPHABET, _STD_ALPHABET)
+
+# Plain text encrypted 64 times with the expanded key to produce the hash
+_MAGIC_TEXT = b"OrpheanBeholderScryDoubt"
+
+# Hash prefixes that share the same algorithm for passwords of up to 72 bytes
+_SUPPORTED_PREFIXES = (b"2a", b"2b", b"2y")
+
+# Utility function to compute the hexadecimal digits of pi
+def _pi_fraction_words(count: int) -> np.ndarray:
+    """
+    Computes the fractional part of pi as a sequence of 32-bit words.
+
+    Blowfish initializes its P-array and S-boxes from the hexadecimal digits
+    of pi. They are computed with Machin's formula in fixed-point integer
+    arithmetic instead of being embedded as a table.
+
+    Args:
+        count (int): The number of 32-bit words to compute.
+
+    Returns:
+        np.ndarray: The words as an int64 array.
+    """
+    guard_bits = 64
+    one = 1 << (32 * count + guard_bits)
+
+    def arctan_inverse(x: int) -> int:
+        power = one // x
+        total = power
+        x_squared = x * x
+        n = 3
+        subtract = True
+        while power:
+            power //= x_squared
+            if subtract:
+                total -= power // n
+            else:
+                total += power // n
+            subtract = not subtract
+            n += 2
+        return total
+
+    pi = 16 * arctan_inverse(5) - 4 * arctan_inverse(239)
+    fraction = (pi >> guard_bits) - (3 << (32 * count))
+    return np.array(
+        [(fraction >> (32 * (count - 1 - i))) & _MASK32 for i in range(count)],
+        dtype=np.int64,
+    )
+
+# Initial Blowfish state: 18 P-array words followed by four 256-word S-boxes
+_PI_WORDS = _pi_fraction_words(18 + 4 * 256)
+_P_INIT = _PI_WORDS[:18]
+_S_INIT = _PI_WORDS[18:]
+
+# Blowfish round function F
+@njit(cache=True, nogil=True, boundscheck=False)
+def _f(x, S):
+    h = (S[x >> 24] + S[256 + ((x >> 16) & 0xFF)]) & _MASK32
+    return ((h ^ S[512 + ((x >> 8) & 0xFF)]) + S[768 + (x & 0xFF)]) & _MASK32
+
+# Encrypt one 64-bit block with the 16-round Blowfish Feistel network
+@njit(cache=True, nogil=True, boundscheck=False)
+def feistel(L, R, P, S):
+    L ^= P[0]
+    for i in range(1, 17, 2):
+        R ^= _f(L, S) ^ P[i]
+        L ^= _f(R, S) ^ P[i + 1]
+    return R ^ P[17], L
+
+# Mix a key (and optionally salt data) into the Blowfish state
+@njit(cache=True, nogil=True, boundscheck=False)
+def _expand_state(P, S, key_words, data_words):
+    for i in range(18):
+        P[i] ^= key_words[i]
+    n = data_words.shape[0]
+    k = 0
+    L = 0
+    R = 0
+    for i in range(0, 18, 2):
+        if n:
+            L ^= data_words[k % n]
+            R ^= data_words[(k + 1) % n]
+            k += 2
+        L, R = feistel(L, R, P, S)
+        P[i] = L
+        P[i + 1] = R
+    for i in range(0, 1024, 2):
+        if n:
+            L ^= data_words[k % n]
+            R ^= data_words[(k + 1) % n]
+            k += 2
+        L, R = feistel(L, R, P, S)
+        S[i] = L
+        S[i + 1] = R
+
+# Expensive key schedule of bcrypt (EksBlowfishSetup)
+@njit(cache=True, nogil=True, boundscheck=False)
+def eks_setup(P, S, salt_words, key_words, salt_key_words, rounds):
+    no_data = np.empty(0, dtype=np.int64)
+    _expand_state(P, S, key_words, salt_words)
+    for _ in range(1 << rounds):
+        _expand_state(P, S, key_words, no_data)
+        _expand_state(P, S, salt_key_words, no_data)
+
+# Encrypt the magic text 64 times with the expanded state
+@njit(cache=True, nogil=True, boundscheck=False)
+def _encrypt_magic(P, S, text_words):
+    for _ in range(64):
+        for i in range(0, text_words.shape[0], 2):
+            text_words[i], text_words[i + 1] = feistel(text_words[i], text_words[i + 1], P, S)
+
+# Utility function to turn bytes into a cyclic stream of big-endian 32-bit words
+def _stream_words(data: bytes, count: int) -> np.ndarray:
+    """
+    Reads `count` big-endian 32-bit words from `data`, wrapping around at its end.
+
+    Args:
+        data (bytes): The source bytes.
+        count (int): The number of words to read.
+
+    Returns:
+        np.ndarray: The words as an int64 array.
+    """
+    stream = (data * (4 * count // len(data) + 1))[:4 * count]
+    return np.array(
+        [int.from_bytes(stream[i:i + 4], "big") for i in range(0, 4 * count, 4)],
+        dtype=np.int64,
+    )
+
+# Utility functions for the bcrypt flavoured base64 encoding (no padding)
+def _b64_encode(data: bytes) -> bytes:
+    return base64.b64encode(data).rstrip(b"=").translate(_TO_BCRYPT)
+
+def _b64_decode(data: bytes) -> bytes:
+    return base64.b64decode(data.translate(_FROM_BCRYPT) + b"=" * (-len(data) % 4))
+
+# Function to generate a random salt
+def gensalt(rounds: int = 12, prefix: bytes = b"2b") -> bytes:
+    """
+    Generates a random bcrypt salt.
+
+    Args:
+        rounds (int): The log2 of the number of key expansion rounds.
+        prefix (bytes): The bcrypt version prefix.
+
+    Returns:
+        bytes: The salt in `$2b$NN$<22 characters>` form.
+
+    Raises:
+        ValueError: If the prefix or the number of rounds is not supported.
+    """
+    if prefix not in _SUPPORTED_PREFIXES:
+        raise ValueError("Supported prefixes are b'2a', b'2b' or b'2y'")
+    if rounds < 4 or rounds > 31:
+        raise ValueError("Invalid rounds")
+    return b"$" + prefix + b"$%02d$" % rounds + _b64_encode(os.urandom(16))
+
+# Function to hash a password
+def hashpw(password: bytes, salt: bytes) -> bytes:
+    """
+    Hashes a password with the given salt.
+
+    Args:
+        password (bytes): The password to hash. Only the first 72 bytes are used.
+        salt (bytes): A salt from `gensalt`, or an existing hash to reuse its salt.
+
+    Returns:
+        bytes: The bcrypt hash.
+
+    Raises:
+        ValueError: If the salt is malformed.
+    """
+    parts = salt.split(b"$")
+    if (
+        len(parts) < 4
+        or parts[1] not in _SUPPORTED_PREFIXES
+        or len(parts[2]) != 2
+        or not parts[2].isdigit()
+        or len(parts[3]) < 22
+    ):
+        raise ValueError("Invalid salt")
+    rounds = int(parts[2])
+    if rounds < 4 or rounds > 31:
+        raise ValueError("Invalid salt")
+    try:
+        raw_salt = _b64_decode(parts[3][:22])[:16]
+    except ValueError:
+        raise ValueError("Invalid salt")
+
+    # The key is the NUL terminated password; bcrypt only ever reads its first 72 bytes
+    key = password[:72] + b"\x00"
+    P = _P_INIT.copy()
+    S = _S_INIT.copy()
+    eks_setup(
+        P, S,
+        _stream_words(raw_salt, 4),
+        _stream_words(key, 18),
+        _stream_words(raw_salt, 18),
+        rounds,
+    )
+    text_words = _stream_words(_MAGIC_TEXT, 6)
+    _encrypt_magic(P, S, text_words)
+    digest = b"".join(int(word).to_bytes(4, "big") for word in text_words)[:23]
+    return b"$" + parts[1] + b"$%02d$" % rounds + _b64_encode(raw_salt) + _b64_encode(digest)
+
+# Function to check a password against a hash
+def checkpw(password: bytes, hashed_password: bytes) -> bool:
+    """
+    Checks a password against a bcrypt hash in constant time.
+
+    Args:
+        password (bytes): The password to check.
+        hashed_password (bytes): The bcrypt hash to check against.
+
+    Returns:
+        bool: True if the password matches, False otherwise.
+
+    Raises:
+        ValueError: If the hash is malformed.
+    """
+    return hmac.compare_digest(hashpw(password, hashed_password), hashed_password)
@@ -1,30 +1,31 @@
 # Import necessary modules
-from sqlalchemy.orm import Session  # For SQLAlchemy ORM session management
+from sqlalchemy import select, text  # For building queries and writing raw SQL statements
+from sqlalchemy.orm import Session, joinedload  # For SQLAlchemy ORM session management and eager loading
 from app import models, schemas  # Import application-specific models and schemas
-from app.auth import get_password_hash  # Import utility for hashing passwords
 
 # Function to create a new user in the database
-def create_user(db: Session, user: schemas.UserCreate):
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
     """
     Creates a new user and saves it to the database.
     
+    The password is hashed by the caller so that the CPU-bound bcrypt work
+    can run off the event loop.
+    
     Args:
         db (Session): The database session.
         user (schemas.UserCreate): The user data to create.
+        hashed_password (str): The bcrypt hash of the user's password.
         
     Returns:
         models.User: The created user object.
     """
-    # Hash the provided password
-    hashed_password = get_password_hash(user.password)
     # Create a new User instance with the hashed password
     db_user = models.User(name=user.name, password=hashed_password)
     # Add the new user to the session
     db.add(db_user)
     # Commit the transaction to save the user to the database
+    # The generated ID is fetched by the INSERT itself and the object is not expired on commit
     db.commit()
-    # Refresh the user instance to get the updated state from the database
-    db.refresh(db_user)
     return db_user
 
 # Function to retrieve a user by ID
@@ -39,7 +40,21 @@ def get_user(db: Session, user_id: int):
     Returns:
         models.User | None: The user object if found, otherwise None.
     """
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return db.get(models.User, user_id)
+
+# Function to retrieve a user by name
+def get_user_by_name(db: Session, name: str):
+    """
+    Retrieves a user from the database by its username.
+    
+    Args:
+        db (Session): The database session.
+        name (str): The username of the user to retrieve.
+        
+    Returns:
+        models.User | None: The user object if found, otherwise None.
+    """
+    return db.execute(select(models.User).where(models.User.name == name)).scalar_one_or_none()
 
 # Function to create a new product in the database
 def create_product(db: Session, product: schemas.ProductCreate):
@@ -58,9 +73,8 @@ def create_product(db: Session, product: schemas.ProductCreate):
     # Add the new product to the session
     db.add(db_product)
     # Commit the transaction to save the product to the database
+    # The generated ID is fetched by the INSERT itself and the object is not expired on commit
     db.commit()
-    # Refresh the product instance to get the updated state from the database
-    db.refresh(db_product)
     return db_product
 
 # Function to retrieve a product by ID and ensure it belongs to a specific user
@@ -76,7 +90,26 @@ def get_product(db: Session, product_id: int, user_id: int):
     Returns:
         models.Product | None: The product object if found and belongs to the user, otherwise None.
     """
-    return db.query(models.Product).filter(models.Product.id == product_id, models.Product.user_id == user_id).first()
+    return db.execute(
+        select(models.Product).where(models.Product.id == product_id, models.Product.user_id == user_id)
+    ).scalar_one_or_none()
+
+# Insert a sale only if its product and user exist, returning it with the product and user names
+# Doing the existence checks, the insert and the name lookups in one statement
+# costs a single database round-trip
+CREATE_SALE_STATEMENT = text("""
+    WITH ins AS (
+        INSERT INTO sales (product_id, user_id)
+        SELECT :product_id, :user_id
+        WHERE EXISTS (SELECT 1 FROM products WHERE id = :product_id)
+          AND EXISTS (SELECT 1 FROM users WHERE id = :user_id)
+        RETURNING id, product_id, user_id
+    )
+    SELECT ins.id, ins.product_id, p.name AS product_name, ins.user_id, u.name AS user_name
+    FROM ins
+    JOIN products p ON p.id = ins.product_id
+    JOIN users u ON u.id = ins.user_id
+""")
 
 # Function to create a new sale in the database
 def create_sale(db: Session, sale: schemas.SalesCreate):
@@ -93,61 +126,41 @@ def create_sale(db: Session, sale: schemas.SalesCreate):
     Raises:
         ValueError: If the product or user does not exist.
     """
-    # Ensure that the product exists
-    product = db.query(models.Product).filter(models.Product.id == sale.product_id).first()
-    # Ensure that the user exists
-    user = db.query(models.User).filter(models.User.id == sale.user_id).first()
+    # Insert the sale and fetch the product and user names in a single round-trip
+    db_sale = db.execute(
+        CREATE_SALE_STATEMENT, {"product_id": sale.product_id, "user_id": sale.user_id}
+    ).mappings().first()
     
-    if not product:
-        raise ValueError("Product not found")
-    if not user:
-        raise ValueError("User not found")
+    if db_sale is None:
+        db.rollback()
+        raise ValueError("Product or user not found")
     
-    # Create a new Sale instance
-    db_sale = models.Sale(product_id=sale.product_id, user_id=sale.user_id)
-    # Add the new sale to the session
-    db.add(db_sale)
     # Commit the transaction to save the sale to the database
     db.commit()
-    # Refresh the sale instance to get the updated state from the database
-    db.refresh(db_sale)
     # Return a dictionary with sale details, including product and user names
-    return {
-        "id": db_sale.id,
-        "product_id": db_sale.product_id,
-        "product_name": product.name,
-        "user_id": db_sale.user_id,
-        "user_name": user.name
-    }
+    return dict(db_sale)
 
 # Function to retrieve a sale by ID and include related product and user details
 def get_sale(db: Session, sale_id: int):
     """
     Retrieves a sale from the database by its ID and includes related product and user details.
     
+    The related product and user names are loaded in the same query through
+    inner joins, so reading `product_name` and `user_name` does not hit the
+    database again. Sales without a product or user are not returned.
+    
     Args:
         db (Session): The database session.
         sale_id (int): The ID of the sale to retrieve.
         
     Returns:
-        Sale | None: A tuple containing sale details, product name, and user name if found, otherwise None.
+        models.Sale | None: The sale object with its product and user loaded if found, otherwise None.
     """
-    # Join Sale with Product and User to get additional fields
-    sale_query = db.query(
-        models.Sale.id,
-        models.Sale.product_id,
-        models.Sale.user_id,
-        models.Product.name.label("product_name"),
-        models.User.name.label("user_name")
-    ).join(
-        models.Product, models.Sale.product_id == models.Product.id
-    ).join(
-        models.User, models.Sale.user_id == models.User.id
-    ).filter(
-        models.Sale.id == sale_id
-    ).first()
-    
-    # Print the query result for debugging purposes
-    print(f"Query result: {sale_query}")
-    
-    return sale_query
+    return db.execute(
+        select(models.Sale)
+        .options(
+            joinedload(models.Sale.product, innerjoin=True).load_only(models.Product.name),
+            joinedload(models.Sale.user, innerjoin=True).load_only(models.User.name),
+        )
+        .where(models.Sale.id == sale_id)
+    ).scalar_one_or_none()
@@ -0,0 +1,16 @@
+# Import the database engine, base class and models
+from app import models  # Import models so their tables are registered on Base.metadata
+from app.database import engine, Base  # Import database engine and base class
+
+# Function to create the database tables
+def init_db():
+    """
+    Creates the database tables defined by the models.
+    
+    Tables that already exist are left untouched. Run this once before
+    starting the application, e.g. with `python -m app.init_db`.
+    """
+    Base.metadata.create_all(bind=engine)
+
+if __name__ == "__main__":
+    init_db()
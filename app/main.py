@@ -1,19 +1,26 @@
-# Import necessary modules from FastAPI, SQLAlchemy, and datetime
-from fastapi import FastAPI, Depends, HTTPException, status
+# Import necessary modules from FastAPI and SQLAlchemy
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import timedelta
 from app import crud, schemas, models  # Import CRUD operations, schemas, and models
-from app.database import engine, Base  # Import database engine and base class
+from app.init_db import init_db  # Import database table creation
 from app.auth import get_db, authenticate_user, create_access_token, get_current_user
-from app.auth import ACCESS_TOKEN_EXPIRE_MINUTES  # Import access token expiration time
+from app.auth import get_password_hash_async, allow_login_attempt
 
-# Create an instance of FastAPI
-app = FastAPI()
+# Application lifespan handler
+# Optionally creates the database tables on startup
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Table creation is opt-in so that normal (multi-worker) boots skip the DDL round-trips
+    if os.getenv("INIT_DB") == "1":
+        await asyncio.to_thread(init_db)
+    yield
 
-# Create database tables
-# This initializes the database schema by creating tables based on the models
-Base.metadata.create_all(bind=engine)
+# Create an instance of FastAPI
+app = FastAPI(lifespan=lifespan)
 
 # OAuth2 scheme for getting the JWT token
 # This is used to specify the URL where the token can be obtained
@@ -21,46 +28,56 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Endpoint to create a new user
 @app.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     """
     Create a new user in the database.
     
     - **user**: The user data provided in the request body.
     - **db**: The database session dependency.
     """
-    return crud.create_user(db=db, user=user)
+    hashed_password = await get_password_hash_async(user.password)
+    return await asyncio.to_thread(crud.create_user, db, user, hashed_password)
 
 # Endpoint to log in and obtain a JWT token
 @app.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Authenticate a user and return an access token.
     
+    Login attempts are rate limited per client address before any password hashing happens.
+    
+    - **request**: The incoming request, used to identify the client.
     - **form_data**: The form data containing username and password.
     - **db**: The database session dependency.
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    client_host = request.client.host if request.client else "unknown"
+    if not allow_login_attempt(client_host):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": "1"},
+        )
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.name}, expires_delta=access_token_expires
-    )
+    # The token uses the default lifetime of ACCESS_TOKEN_EXPIRE_MINUTES
+    access_token = create_access_token(data={"sub": str(user.id), "name": user.name})
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Endpoint to get the current user's information
-@app.get("/users/me/", response_model=schemas.User)
+# The response is built directly from the already validated user, so no response model is applied
+@app.get("/users/me/", responses={200: {"model": schemas.User}})
 def read_users_me(current_user: schemas.User = Depends(get_current_user)):
     """
     Get information about the currently authenticated user.
     
     - **current_user**: The current user obtained from the JWT token.
     """
-    return current_user
+    return {"id": current_user.id, "name": current_user.name}
 
 # Endpoint to create a new product
 @app.post("/products/", response_model=schemas.Product)
@@ -75,7 +92,8 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
     return crud.create_product(db=db, product=product)
 
 # Endpoint to get a product by its ID
-@app.get("/products/{product_id}", response_model=schemas.Product)
+# The response is serialized with a prebuilt TypeAdapter, so no response model is applied
+@app.get("/products/{product_id}", responses={200: {"model": schemas.Product}})
 def read_product(product_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
     """
     Get a product by its ID. Only accessible by the owner of the product.
@@ -84,11 +102,11 @@ def read_product(product_id: int, db: Session = Depends(get_db), current_user: s
     - **db**: The database session dependency.
     - **current_user**: The currently authenticated user.
     """
-    print(f"Current User ID: {current_user.id}")  # Debug statement to print current user ID
     db_product = crud.get_product(db, product_id=product_id, user_id=current_user.id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return db_product
+    product = schemas.ProductAdapter.validate_python(db_product)
+    return Response(content=schemas.ProductAdapter.dump_json(product), media_type="application/json")
 
 # Endpoint to create a new sale
 @app.post("/sales/", response_model=schemas.Sales)
@@ -103,7 +121,8 @@ def create_sale(sale: schemas.SalesCreate, db: Session = Depends(get_db), curren
     return crud.create_sale(db=db, sale=sale)
 
 # Endpoint to get a sale by its ID
-@app.get("/sales/{sale_id}", response_model=schemas.Sales)
+# The response is serialized with a prebuilt TypeAdapter, so no response model is applied
+@app.get("/sales/{sale_id}", responses={200: {"model": schemas.Sales}})
 def read_sale(sale_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(get_current_user)):
     """
     Get a sale by its ID.
@@ -113,9 +132,7 @@ def read_sale(sale_id: int, db: Session = Depends(get_db), current_user: schemas
     - **current_user**: The currently authenticated user.
     """
     db_sale = crud.get_sale(db, sale_id=sale_id)
-    print("db_sale saved")  # Debug statement to indicate that the sale was fetched
     if db_sale is None:
-        print("ïn the if statement")  # Debug statement if sale is not found
         raise HTTPException(status_code=404, detail="Sale not found")
-    print("the end of the funtion")  # Debug statement to indicate function completion
-    return db_sale
+    sale = schemas.SalesAdapter.validate_python(db_sale)
+    return Response(content=schemas.SalesAdapter.dump_json(sale), media_type="application/json")
@@ -1,5 +1,5 @@
 # Import necessary modules from SQLAlchemy
-from sqlalchemy import Column, Integer, String, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -15,6 +15,8 @@ class User(Base):
     - **sales**: Relationship to the Sale model (one-to-many).
     """
     __tablename__ = "users"
+    # Fetch server-generated values with RETURNING as part of the INSERT
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
@@ -39,9 +41,13 @@ class Product(Base):
     - **sales**: Relationship to the Sale model (one-to-many).
     """
     __tablename__ = "products"
+    # Fetch server-generated values with RETURNING as part of the INSERT
+    __mapper_args__ = {"eager_defaults": True}
+    # Composite index so lookups by (user_id, id) are answered by a single index probe
+    __table_args__ = (Index("ix_products_user_id_id", "user_id", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    name = Column(String)
     price = Column(Float)
     user_id = Column(Integer, ForeignKey("users.id"))
 
@@ -61,8 +67,14 @@ class Sale(Base):
     - **user_id**: Foreign key referencing the User model.
     - **product**: Relationship to the Product model (many-to-one).
     - **user**: Relationship to the User model (many-to-one).
+    - **product_name**: Name of the related product.
+    - **user_name**: Name of the related user.
     """
     __tablename__ = "sales"
+    # Fetch server-generated values with RETURNING as part of the INSERT
+    __mapper_args__ = {"eager_defaults": True}
+    # Composite index over the foreign keys used when joining sales to products and users
+    __table_args__ = (Index("ix_sales_product_user", "product_id", "user_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
@@ -71,3 +83,12 @@ class Sale(Base):
     # Relationships to Product and User
     product = relationship("Product", back_populates="sales")
     user = relationship("User", back_populates="sales")
+
+    # Names of the related product and user, read by the Sales response schema
+    @property
+    def product_name(self) -> str:
+        return self.product.name
+
+    @property
+    def user_name(self) -> str:
+        return self.user.name
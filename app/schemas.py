@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 # Define a schema for the token response
 class Token(BaseModel):
@@ -57,11 +57,8 @@ class User(BaseModel):
     id: int
     name: str
 
-    class Config:
-        """
-        Configuration to allow creating models from attributes
-        """
-        from_attributes = True
+    # Configuration to allow creating models from attributes
+    model_config = ConfigDict(from_attributes=True)
 
 # Define a schema for the product model response
 class Product(BaseModel):
@@ -78,11 +75,8 @@ class Product(BaseModel):
     price: float
     user_id: int
 
-    class Config:
-        """
-        Configuration to allow creating models from attributes
-        """
-        from_attributes = True
+    # Configuration to allow creating models from attributes
+    model_config = ConfigDict(from_attributes=True)
 
 # Define a schema for the sales model response
 class Sales(BaseModel):
@@ -101,8 +95,10 @@ class Sales(BaseModel):
     user_id: int
     user_name: str
 
-    class Config:
-        """
-        Configuration to allow creating models from attributes
-        """
-        from_attributes = True
+    # Configuration to allow creating models from attributes
+    model_config = ConfigDict(from_attributes=True)
+
+# Type adapters built once at import time
+# Hot read endpoints use them to validate ORM objects and serialize them straight to JSON
+ProductAdapter = TypeAdapter(Product)
+SalesAdapter = TypeAdapter(Sales)